@@ -1,15 +1,26 @@
+import io
+import time
 import streamlit as st
 import pandas as pd
-import json
+import orjson
+import ijson
 import requests
+import xxhash
 from urllib.parse import urlparse
 import geopandas as gpd
 import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pacsv
+import shapely
 from shapely.geometry import shape
 
 # Set page config to wide mode
 st.set_page_config(layout="wide")
 
+# Remote content is refetched after this many seconds
+URL_CACHE_TTL = 600
+
 def is_valid_url(url):
     try:
         result = urlparse(url)
@@ -17,41 +28,202 @@ def is_valid_url(url):
     except:
         return False
 
-def load_geojson_from_url(url):
-    try:
-        response = requests.get(url)
-        return response.json()
-    except Exception as e:
-        st.error(f"Error loading GeoJSON from URL: {str(e)}")
-        return None
+class DigestReader:
+    # Passes the stream through to the parser, hashing every chunk it reads
+    # so the content id is known as soon as parsing is done
+    def __init__(self, raw, digest):
+        self.raw = raw
+        self.digest = digest
+    
+    def read(self, size=-1):
+        chunk = self.raw.read(size)
+        self.digest.update(chunk)
+        return chunk
 
-def geojson_to_dataframe(geojson_data):
-    try:
-        # Convert GeoJSON to GeoDataFrame
-        gdf = gpd.GeoDataFrame.from_features(geojson_data["features"])
-        
-        # Extract properties as a regular DataFrame
-        properties_df = pd.DataFrame([feature["properties"] for feature in geojson_data["features"]])
+def iter_url_features(response, digest):
+    # The generator owns the response, so the connection is released as soon
+    # as the features have been consumed. The body is hashed into digest on
+    # the way through
+    with response:
+        content_type = response.headers.get("Content-Type", "")
+        if "json-seq" in content_type or "ndjson" in content_type:
+            # GeoJSON text sequences carry one feature per line, optionally
+            # prefixed with the RFC 8142 record separator
+            for line in response.iter_lines(chunk_size=1 << 20):
+                digest.update(line + b"\n")
+                if line.strip(b"\x1e \t"):
+                    yield orjson.loads(line.lstrip(b"\x1e"))
+            return
         
-        # Add WKT representation of geometries
-        properties_df['geometry_wkt'] = gdf.geometry.to_wkt()
-        
-        return properties_df
-    except Exception as e:
-        st.error(f"Error converting GeoJSON to DataFrame: {str(e)}")
+        # Lazy iterator, so features are converted while bytes are still arriving.
+        # The stream goes to ijson directly so its C backend builds the items
+        response.raw.decode_content = True
+        count = 0
+        for feature in ijson.items(DigestReader(response.raw, digest), "features.item", use_float=True, buf_size=1 << 20):
+            count += 1
+            yield feature
+        if not count:
+            # A bare Feature or any other object yields no items at all
+            raise ValueError("no features found, expected a FeatureCollection with a 'features' array")
+
+def load_geojson_from_url(url, digest):
+    # Stream the body so features are parsed while the download is still
+    # running and the raw response is never held in memory as a whole
+    response = requests.get(url, stream=True, timeout=30)
+    try:
+        response.raise_for_status()
+    except requests.HTTPError:
+        response.close()
+        raise
+    return iter_url_features(response, digest)
+
+def downcast_column(column):
+    # Narrow each column to the smallest type that holds its values exactly.
+    # Floats stay float64: float32 values print with their own shorter repr
+    if len(column) == column.null_count:
+        return column
+    
+    if pa.types.is_integer(column.type):
+        bounds = pc.min_max(column)
+        low, high = bounds["min"].as_py(), bounds["max"].as_py()
+        for candidate in (pa.int8(), pa.int16(), pa.int32()):
+            info = np.iinfo(candidate.to_pandas_dtype())
+            if info.min <= low and high <= info.max:
+                return column.cast(candidate)
+    elif pa.types.is_string(column.type):
+        # Repeated labels are stored once and referenced by small codes
+        if pc.count_distinct(column).as_py() < len(column) * 0.5:
+            return column.dictionary_encode()
+    return column
+
+def _arrow_to_pandas_dtype(arrow_type):
+    # Dictionary columns become pandas categoricals, the rest stay Arrow-backed
+    if pa.types.is_dictionary(arrow_type):
         return None
+    return pd.ArrowDtype(arrow_type)
+
+def properties_to_dataframe(columns, num_rows):
+    if not columns:
+        # No properties at all, keep one (empty) row per feature
+        return pd.DataFrame(index=pd.RangeIndex(num_rows))
+    
+    # Arrow infers one type per column in C and keeps the columns
+    # Arrow-backed, which also makes the filter masks cheaper
+    arrays = {}
+    mixed = {}
+    for name, values in columns.items():
+        try:
+            arrays[name] = downcast_column(pa.chunked_array([pa.array(values)]))
+        except (pa.ArrowInvalid, TypeError, OverflowError):
+            # Columns mixing value types, or ints beyond 64 bits, have no
+            # single Arrow type
+            mixed[name] = values
+    
+    if arrays:
+        properties_df = pa.table(arrays).to_pandas(types_mapper=_arrow_to_pandas_dtype)
+    else:
+        properties_df = pd.DataFrame(index=pd.RangeIndex(num_rows))
+    
+    # Put mixed columns back in their original position as plain objects
+    names = list(columns)
+    for name, values in mixed.items():
+        properties_df.insert(names.index(name), name, pd.Series(values, dtype=object))
+    return properties_df
 
-def create_numeric_filter(df, column):
+def features_to_dataframe(features):
+    # Single pass over the features, which may be a streaming iterator,
+    # so each feature dict can be dropped as soon as it is split up.
+    # Properties are gathered column by column, padding absent keys with
+    # None, which avoids pandas' slow list-of-dicts constructor
+    columns = {}
+    geometries = []
+    for row, feature in enumerate(features):
+        for key, value in (feature.get("properties") or {}).items():
+            values = columns.setdefault(key, [])
+            if len(values) < row:
+                values.extend([None] * (row - len(values)))
+            values.append(value)
+        geometries.append(shape(feature["geometry"]) if feature.get("geometry") else None)
+    
+    num_rows = len(geometries)
+    for values in columns.values():
+        values.extend([None] * (num_rows - len(values)))
+    
+    # The WKT column replaces a property of the same name, as it always has
+    columns.pop('geometry_wkt', None)
+    
+    # Extract properties as a regular DataFrame
+    properties_df = properties_to_dataframe(columns, num_rows)
+    
+    # Only the geometries are needed for the WKT column, so build a bare
+    # GeoSeries instead of a full GeoDataFrame that re-parses the properties.
+    # The WKT strings themselves are only built once a view asks for them
+    geometry = gpd.GeoSeries(geometries).values
+    
+    return properties_df, geometry
+
+@st.cache_data(show_spinner=False, max_entries=16)
+def geojson_to_dataframe(raw_bytes):
+    # Cached on the raw bytes so reruns triggered by widgets skip the parse.
+    # Failures raise instead of returning None, so they are never cached
+    geojson_data = orjson.loads(raw_bytes)
+    if not isinstance(geojson_data, dict) or "features" not in geojson_data:
+        raise ValueError("expected a FeatureCollection with a 'features' array")
+    
+    return features_to_dataframe(geojson_data["features"])
+
+@st.cache_data(show_spinner=False, ttl=URL_CACHE_TTL, max_entries=16)
+def url_to_dataframe(url):
+    # Cached per URL so reruns skip the download; failures raise and are
+    # never cached, so a timeout or 5xx can be retried. The same URL can serve
+    # new content after a refetch, so the data comes with an id of the body
+    digest = xxhash.xxh3_64()
+    data = features_to_dataframe(load_geojson_from_url(url, digest))
+    return digest.digest(), data
+
+@st.cache_data(show_spinner=False, max_entries=16)
+def column_meta(fingerprint, _df):
+    # Everything the filter widgets need, computed once per dataset. Keyed on
+    # the dataset fingerprint so reruns never hash (or pickle) the frame
+    meta = {}
+    for column in _df.columns:
+        # Numeric columns get a range slider, the rest a multiselect
+        series = _df[column]
+        if pd.api.types.is_numeric_dtype(series):
+            # NaN-aware reductions on the float array, no dropna() copy
+            values = series.to_numpy(dtype=np.float64, na_value=np.nan)
+            has_values = not np.isnan(values).all()
+            meta[column] = {
+                "numeric": True,
+                "values": values,
+                "min": float(np.nanmin(values)) if has_values else None,
+                "max": float(np.nanmax(values)) if has_values else None,
+            }
+        else:
+            try:
+                if isinstance(series.dtype, pd.CategoricalDtype):
+                    # Dictionary-encoded columns already know their labels
+                    uniques = series.cat.categories.tolist()
+                elif isinstance(series.dtype, pd.ArrowDtype):
+                    uniques = pa.Array.from_pandas(series).drop_null().unique().to_pylist()
+                else:
+                    uniques = series.dropna().unique().tolist()
+            except (TypeError, NotImplementedError):
+                # Nested objects and lists are not hashable, so no multiselect
+                uniques = []
+            meta[column] = {
+                "numeric": False,
+                "uniques": uniques,
+            }
+    return meta
+
+def create_numeric_filter(column, column_info):
     try:
-        # Convert to float and handle NaN values
-        values = pd.to_numeric(df[column], errors='coerce')
-        valid_values = values.dropna()
-        
-        if len(valid_values) == 0:
+        if column_info["min"] is None:
             return None
         
-        min_val = float(valid_values.min())
-        max_val = float(valid_values.max())
+        min_val = column_info["min"]
+        max_val = column_info["max"]
         
         # Ensure min and max are not equal to avoid slider issues
         if min_val == max_val:
@@ -71,7 +243,7 @@ def create_numeric_filter(df, column):
         st.warning(f"Could not create numeric filter for column {column}: {str(e)}")
         return None
 
-def create_filter_layout(df):
+def create_filter_layout(df, meta):
     # Calculate number of columns based on total number of properties
     num_properties = len(df.columns)
     num_columns = min(5, max(3, num_properties // 4))  # Adjust number of columns based on properties
@@ -84,29 +256,213 @@ def create_filter_layout(df):
     # Create a container for filters with scrolling
     with st.container():
         for idx, column in enumerate(df.columns):
-            # Skip geometry_wkt column for filtering
-            if column == 'geometry_wkt':
+            if column not in meta:
                 continue
                 
             with cols[idx % num_columns]:
-                # Try to convert to numeric, if fails, treat as categorical
-                try:
-                    numeric_series = pd.to_numeric(df[column], errors='raise')
-                    numeric_filter = create_numeric_filter(df, column)
+                column_info = meta[column]
+                if column_info["numeric"]:
+                    numeric_filter = create_numeric_filter(column, column_info)
                     if numeric_filter is not None:
                         filters[column] = numeric_filter
-                except:
+                else:
                     # For non-numeric columns, create a multiselect
-                    unique_values = df[column].dropna().unique()
+                    unique_values = column_info["uniques"]
                     if len(unique_values) > 0 and len(unique_values) <= 100:  # Limit unique values to prevent UI overload
                         filters[column] = st.multiselect(
                             f"Filter {column}",
                             options=unique_values,
                             default=[]
                         )
+                    elif len(unique_values) > 100:
+                        # Too many options to ship to the browser, match on a substring instead
+                        filters[column] = ("contains", st.text_input(f"Filter {column} contains"))
     
     return filters
 
+@st.cache_data(show_spinner=False, max_entries=16)
+def column_stats(fingerprint, _df):
+    # All three statistics per column in one visit instead of three
+    # DataFrame-wide scans, keyed on the dataset fingerprint like column_meta
+    types, unique_counts, missing_counts = [], [], []
+    for column in _df.columns:
+        series = _df[column]
+        types.append(str(series.dtype))
+        try:
+            unique_counts.append(series.nunique())
+        except (TypeError, NotImplementedError):
+            # Nested objects and lists are not hashable
+            unique_counts.append(None)
+        missing_counts.append(int(series.isna().sum()))
+    
+    return pd.DataFrame({
+        'Column': _df.columns,
+        'Type': types,
+        # Nullable ints, so unhashable columns do not turn the counts into floats
+        'Unique Values': pd.array(unique_counts, dtype="Int64"),
+        'Missing Values': missing_counts
+    }, index=_df.columns)
+
+def csv_column(series):
+    # Nested values and columns mixing types have no CSV representation in
+    # Arrow, so their cells are written as JSON text (strings as they are)
+    try:
+        array = pa.array(series, from_pandas=True)
+        if not pa.types.is_nested(array.type):
+            return array
+    except (pa.ArrowException, TypeError, OverflowError):
+        pass
+    return pa.array(
+        [value if value is None or isinstance(value, str) else orjson.dumps(value).decode()
+         for value in series.tolist()],
+        type=pa.string()
+    )
+
+def dataframe_to_csv(df):
+    # pyarrow's multithreaded C writer instead of pandas' Python to_csv,
+    # for every column so the output format never depends on the data
+    table = pa.Table.from_arrays(
+        [csv_column(df[column]) for column in df.columns],
+        names=df.columns.tolist()
+    )
+    buffer = io.BytesIO()
+    pacsv.write_csv(table, buffer)
+    return buffer.getvalue()
+
+def geometry_to_wkt(geometry):
+    # WKT strings are by far the largest values, so they are built on first
+    # use and kept for as long as this geometry array is the one on screen
+    cached = st.session_state.get("geometry_wkt")
+    if cached is None or cached[0] is not geometry:
+        cached = (geometry, shapely.to_wkt(geometry, rounding_precision=6))
+        st.session_state["geometry_wkt"] = cached
+    return cached[1]
+
+def attach_geometry(df, wkt, rows, columns):
+    # Select the filtered rows and the output columns in a single slice, then
+    # join the WKT column only when geometry_wkt is among the output columns
+    view = df.loc[rows, [column for column in columns if column != 'geometry_wkt']]
+    if 'geometry_wkt' in columns:
+        view = view.assign(geometry_wkt=wkt[rows])
+    return view[columns]
+
+@st.cache_data(show_spinner=False, max_entries=16)
+def filtered_csv(signature, columns, _df, _wkt, _rows):
+    # Keyed on the dataset fingerprint and filter mask digest rather than the
+    # DataFrame itself, so an unchanged filter state skips hashing, slicing
+    # and encoding. Only the requested columns are sliced and written. The
+    # WKT array comes in ready-made so this function never touches session state
+    return dataframe_to_csv(attach_geometry(_df, _wkt, _rows, columns))
+
+def csv_download(signature, columns, df, geometry, wkt, rows):
+    # Handed to st.download_button, which only calls it on click and on a
+    # thread outside the script run, so the WKT memo in session state is out
+    # of reach there and the strings are built directly if still missing
+    def build():
+        column_wkt = wkt
+        if column_wkt is None and 'geometry_wkt' in columns:
+            column_wkt = shapely.to_wkt(geometry, rounding_precision=6)
+        return filtered_csv(signature, columns, df, column_wkt, rows)
+    return build
+
+# Widget changes in here only rerun this panel, not the input handling in main
+@st.fragment
+def data_panel(df, geometry, fingerprint):
+    # Create tabs for better organization
+    tab1, tab2 = st.tabs(["Data View", "Summary"])
+    
+    with tab1:
+        # Filters section
+        meta = column_meta(fingerprint, df)
+        with st.expander("Filters", expanded=True):
+            filters = create_filter_layout(df, meta)
+        
+        # Apply filters as one combined mask and slice once at the end
+        mask = np.ones(len(df), dtype=bool)
+        for column, filter_value in filters.items():
+            if filter_value:  # If filter is set
+                if isinstance(filter_value, tuple) and filter_value[0] == "contains":  # Substring
+                    if filter_value[1]:  # If any text is entered
+                        mask &= df[column].astype("string").str.contains(
+                            filter_value[1], case=False, regex=False, na=False
+                        ).to_numpy(dtype=bool)
+                elif isinstance(filter_value, tuple):  # Numeric range
+                    values = meta[column]["values"]
+                    mask &= (values >= filter_value[0]) & (values <= filter_value[1])
+                elif isinstance(filter_value, list):  # Multiselect
+                    if filter_value:  # If any values are selected
+                        mask &= df[column].isin(filter_value).to_numpy()
+        # Untouched filters keep every row, so skip the row selection entirely
+        rows = slice(None) if mask.all() else mask
+        num_filtered = int(mask.sum())
+        
+        # Column selection for display
+        all_columns = df.columns.tolist() + ['geometry_wkt']
+        selected_columns = st.multiselect(
+            "Select columns to display",
+            options=all_columns,
+            default=all_columns
+        )
+        
+        # The WKT memo lives in session state, so it is resolved here in the
+        # script run, and only when the table actually shows the column
+        wkt = geometry_to_wkt(geometry) if 'geometry_wkt' in selected_columns else None
+        
+        # Display filtered DataFrame with selected columns
+        if selected_columns:
+            st.dataframe(
+                attach_geometry(df, wkt, rows, selected_columns),
+                use_container_width=True
+            )
+        
+        # Download options
+        if num_filtered > 0:
+            signature = (fingerprint, xxhash.xxh3_64_digest(mask.tobytes()))
+            col1, col2 = st.columns(2)
+            with col1:
+                # Download full data, generated only when clicked
+                st.download_button(
+                    label="Download all columns as CSV",
+                    data=csv_download(signature, all_columns, df, geometry, wkt, rows),
+                    file_name="filtered_geojson_data_full.csv",
+                    mime="text/csv",
+                )
+            with col2:
+                # Download selected columns, generated only when clicked
+                if selected_columns:
+                    st.download_button(
+                        label="Download selected columns as CSV",
+                        data=csv_download(signature, selected_columns, df, geometry, wkt, rows),
+                        file_name="filtered_geojson_data_selected.csv",
+                        mime="text/csv",
+                    )
+    
+    with tab2:
+        # Display summary statistics
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            st.metric("Total Features", len(df))
+        with col2:
+            st.metric("Filtered Features", num_filtered)
+        with col3:
+            st.metric("Number of Properties", len(df.columns))
+        
+        # Add more detailed statistics
+        if len(df.columns) > 0:
+            st.subheader("Column Statistics")
+            st.dataframe(column_stats(fingerprint, df), use_container_width=True)
+
+def load_once(fingerprint, loader, source):
+    # Reruns with the same input reuse the objects from session state
+    # instead of hashing the input again and unpickling st.cache_data's copy
+    stored = st.session_state.get("loaded_data")
+    if stored is not None and stored[0] == fingerprint:
+        return stored[1]
+    
+    data = loader(source)
+    st.session_state["loaded_data"] = (fingerprint, data)
+    return data
+
 def main():
     st.title("GeoJSON Checker")
     
@@ -120,111 +476,51 @@ def main():
             ["Upload File", "URL", "Direct Input"]
         )
     
-    geojson_data = None
+    raw_geojson = None
+    fingerprint = None
+    data = None
     
     with col2:
         if input_method == "Upload File":
             uploaded_file = st.file_uploader("Upload GeoJSON file", type=["json", "geojson"])
             if uploaded_file:
                 try:
-                    geojson_data = json.load(uploaded_file)
+                    raw_geojson = uploaded_file.getvalue()
                 except Exception as e:
                     st.error(f"Error reading file: {str(e)}")
         
         elif input_method == "URL":
             url = st.text_input("Enter GeoJSON URL")
             if url and is_valid_url(url):
-                geojson_data = load_geojson_from_url(url)
+                # Bucketed by the cache ttl so long sessions also see fresh content
+                source = ("url", url, int(time.time() // URL_CACHE_TTL))
+                try:
+                    content_id, data = load_once(source, url_to_dataframe, url)
+                    # The derived caches are keyed on the body actually fetched,
+                    # which a refetch within the same bucket may have changed
+                    fingerprint = ("url", content_id)
+                except Exception as e:
+                    st.error(f"Error loading GeoJSON from URL: {str(e)}")
         
         else:  # Direct Input
             geojson_text = st.text_area("Paste GeoJSON data", height=150)
             if geojson_text:
-                try:
-                    geojson_data = json.loads(geojson_text)
-                except Exception as e:
-                    st.error(f"Error parsing GeoJSON: {str(e)}")
+                raw_geojson = geojson_text.encode()
     
-    if geojson_data:
+    if raw_geojson:
         # Convert to DataFrame
-        df = geojson_to_dataframe(geojson_data)
-        
-        if df is not None and not df.empty:
-            # Create tabs for better organization
-            tab1, tab2 = st.tabs(["Data View", "Summary"])
-            
-            with tab1:
-                # Filters section
-                with st.expander("Filters", expanded=True):
-                    filters = create_filter_layout(df)
-                
-                # Apply filters
-                filtered_df = df.copy()
-                for column, filter_value in filters.items():
-                    if filter_value:  # If filter is set
-                        if isinstance(filter_value, tuple):  # Numeric range
-                            numeric_series = pd.to_numeric(filtered_df[column], errors='coerce')
-                            filtered_df = filtered_df[
-                                (numeric_series >= filter_value[0]) & 
-                                (numeric_series <= filter_value[1])
-                            ]
-                        elif isinstance(filter_value, list):  # Multiselect
-                            if filter_value:  # If any values are selected
-                                filtered_df = filtered_df[filtered_df[column].isin(filter_value)]
-                
-                # Column selection for display
-                selected_columns = st.multiselect(
-                    "Select columns to display",
-                    options=filtered_df.columns.tolist(),
-                    default=filtered_df.columns.tolist()
-                )
-                
-                # Display filtered DataFrame with selected columns
-                if selected_columns:
-                    st.dataframe(filtered_df[selected_columns], use_container_width=True)
-                
-                # Download options
-                if not filtered_df.empty:
-                    col1, col2 = st.columns(2)
-                    with col1:
-                        # Download full data
-                        csv = filtered_df.to_csv(index=False)
-                        st.download_button(
-                            label="Download all columns as CSV",
-                            data=csv,
-                            file_name="filtered_geojson_data_full.csv",
-                            mime="text/csv",
-                        )
-                    with col2:
-                        # Download selected columns
-                        if selected_columns:
-                            csv_selected = filtered_df[selected_columns].to_csv(index=False)
-                            st.download_button(
-                                label="Download selected columns as CSV",
-                                data=csv_selected,
-                                file_name="filtered_geojson_data_selected.csv",
-                                mime="text/csv",
-                            )
-            
-            with tab2:
-                # Display summary statistics
-                col1, col2, col3 = st.columns(3)
-                with col1:
-                    st.metric("Total Features", len(df))
-                with col2:
-                    st.metric("Filtered Features", len(filtered_df))
-                with col3:
-                    st.metric("Number of Properties", len(df.columns))
-                
-                # Add more detailed statistics
-                if len(df.columns) > 0:
-                    st.subheader("Column Statistics")
-                    stats_df = pd.DataFrame({
-                        'Column': df.columns,
-                        'Type': df.dtypes.astype(str),
-                        'Unique Values': df.nunique(),
-                        'Missing Values': df.isnull().sum()
-                    })
-                    st.dataframe(stats_df, use_container_width=True)
+        fingerprint = ("bytes", xxhash.xxh3_64_digest(raw_geojson))
+        try:
+            data = load_once(fingerprint, geojson_to_dataframe, raw_geojson)
+        except orjson.JSONDecodeError as e:
+            st.error(f"Error parsing GeoJSON: {str(e)}")
+        except Exception as e:
+            st.error(f"Error converting GeoJSON to DataFrame: {str(e)}")
+    
+    if data is not None:
+        df, geometry = data
+        if len(geometry) > 0:
+            data_panel(df, geometry, fingerprint)
 
 if __name__ == "__main__":
     main()